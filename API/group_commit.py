@@ -0,0 +1,335 @@
+"""Group-commit write-behind queue for articles
+
+Posts are queued to a single background thread, which gathers up to
+`max_batch` articles (waiting at most `max_delay` seconds for the batch to
+fill) and appends them all to a journal with one write and one fsync.
+Deletions go through the same queue as tombstones. Callers block until
+their batch is in the journal, then write (or remove) their own article
+file, so file creation runs in parallel. An acknowledged change survives a
+crash: on startup the journal is replayed over the article files.
+
+Only one writer (in one process) may use a directory at a time; the
+journal is locked, and a second writer raises RuntimeError. That also makes
+any streamed upload files (".*.part") found on startup stale, so they are
+removed.
+"""
+
+# Imports
+import os
+import json
+import time
+import fcntl
+import queue
+import threading
+
+from typing import List, Optional, Set
+from dataclasses import dataclass, field
+
+JOURNAL_NAME = ".journal"
+# Suffix of the hidden files streamed posts write before they get an ID
+PART_SUFFIX = ".part"
+
+
+@dataclass
+class _Pending:
+  """A journal entry waiting to be committed, one of:
+      {"id": id, "article": {...}}  write an article
+      {"id": id, "article": None}   delete an article
+      {"id": id, "file": name}      move a finished file in the directory into place
+  """
+  entry: dict
+  done: threading.Event = field(default_factory=threading.Event)
+  error: Optional[BaseException] = None
+
+
+class GroupCommitWriter:
+  """Batches article writes into a single journal write + fsync"""
+
+  def __init__(self, directory: str, max_batch: int = 64, max_delay: float = .001,
+               journal_max_bytes: int = 4 * 1024 * 1024):
+    self.directory = directory
+    self.max_batch = max_batch
+    self.max_delay = max_delay
+    self.journal_max_bytes = journal_max_bytes
+    # Number of group commits so far
+    self.batches = 0
+
+    self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+    self._lock = threading.Lock()
+    # Journaled entries whose files are still being written by their callers
+    self._applying = 0
+    self._applied = threading.Condition()
+    # Files written since the journal was last truncated
+    self._unsynced: List[str] = []
+    # IDs on disk or handed out, and the lowest ID that may be free
+    self._used: Set[int] = set()
+    self._next_free = 0
+
+    os.makedirs(directory, exist_ok=True)
+    self._journal_path = os.path.join(directory, JOURNAL_NAME)
+    self._journal = open(self._journal_path, "ab")
+    try:
+      fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      self._journal.close()
+      raise RuntimeError(
+        f"{directory} is already in use by another group-commit writer; "
+        "only one process may write articles with ARTICLE_GROUP_COMMIT on"
+      )
+    self._replay()
+
+    self._used = {int(name) for name in os.listdir(directory) if name.isdigit()}
+
+    self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+    self._thread.start()
+
+  def _path(self, id: int) -> str:
+    return os.path.join(self.directory, str(id))
+
+  def allocate_id(self) -> int:
+    """Returns the lowest free article ID, skipping IDs still in the queue"""
+    with self._lock:
+      while self._next_free in self._used: self._next_free += 1
+      id = self._next_free
+      self._used.add(id)
+      return id
+
+  def release_id(self, id: int):
+    """Returns an ID that is not (or no longer) on disk"""
+    with self._lock:
+      self._used.discard(id)
+      self._next_free = min(self._next_free, id)
+
+  def _submit(self, entry: dict, apply: bool = True):
+    """Queues a journal entry, blocks until its batch is durable, then applies it"""
+    pending = _Pending(entry)
+    with self._lock:
+      if self._thread is None:
+        pending.error = RuntimeError("Group-commit writer is closed")
+        pending.done.set()
+      else:
+        self._queue.put(pending)
+    pending.done.wait()
+    if pending.error is not None:
+      # Never journaled, so a new article's ID was not used after all
+      if "file" in entry or entry["article"] is not None:
+        self.release_id(entry["id"])
+      raise pending.error
+
+    try:
+      if apply:
+        self._apply(entry)
+    except OSError:
+      self._finish_apply()
+      self._undo(entry)
+      raise
+    self._finish_apply()
+
+  def _finish_apply(self):
+    with self._applied:
+      self._applying -= 1
+      self._applied.notify_all()
+
+  def write(self, id: int, article: dict):
+    """Writes an article, blocking until its batch is durable
+
+      Raises the OSError from the commit if the article could not be written,
+      in which case the ID is released
+    """
+    self._submit({"id": id, "article": article})
+
+  def write_file(self, id: int, path: str):
+    """Moves a complete, fsynced file in the directory into place as article ID,
+      blocking until the move is durable; on failure the ID is released
+    """
+    self._submit({"id": id, "file": os.path.basename(path)})
+
+  def delete(self, id: int):
+    """Deletes an article, blocking until the deletion is durable"""
+    self._submit({"id": id, "article": None})
+
+  def close(self):
+    """Commits anything queued, then stops the writer and unlocks the directory"""
+    if self._thread is None:
+      return
+    self._queue.put(None)
+    self._thread.join()
+    with self._lock:
+      self._thread = None
+      # Fail anything queued after the writer stopped
+      while not self._queue.empty():
+        pending = self._queue.get_nowait()
+        if pending is not None:
+          pending.error = RuntimeError("Group-commit writer is closed")
+          pending.done.set()
+    with self._applied:
+      self._applied.wait_for(lambda: self._applying == 0)
+    self._journal.close()
+
+  def _run(self):
+    """Writer thread: gathers batches and commits them"""
+    while True:
+      first = self._queue.get()
+      if first is None:
+        return
+      batch = [first]
+      closing = False
+      deadline = time.monotonic() + self.max_delay
+      while len(batch) < self.max_batch:
+        remaining = deadline - time.monotonic()
+        try:
+          if remaining > 0:
+            pending = self._queue.get(timeout=remaining)
+          else:
+            pending = self._queue.get_nowait()
+        except queue.Empty:
+          break
+        if pending is None:
+          closing = True
+          break
+        batch.append(pending)
+      self._commit(batch)
+      if closing:
+        return
+
+  def _commit(self, batch: List[_Pending]):
+    """Writes a batch to the journal with one fsync, then releases the callers"""
+    try:
+      self._append([p.entry for p in batch])
+    except OSError as e:
+      for p in batch:
+        p.error = e
+    else:
+      self.batches += 1
+      with self._applied:
+        self._applying += len(batch)
+    finally:
+      for p in batch:
+        p.done.set()
+
+    if self._journal.tell() >= self.journal_max_bytes:
+      # Truncating is only safe once every journaled entry is in its file
+      with self._applied:
+        self._applied.wait_for(lambda: self._applying == 0)
+      try:
+        self._checkpoint()
+      except OSError:
+        # The journal still holds everything; try again next batch
+        pass
+
+  def _append(self, entries: List[dict]):
+    """Appends entries to the journal with one write and one fsync"""
+    payload = "".join(json.dumps(entry) + "\n" for entry in entries)
+    start = self._journal.tell()
+    try:
+      self._journal.write(payload.encode())
+      self._journal.flush()
+      os.fsync(self._journal.fileno())
+    except OSError:
+      # Don't leave a torn line that would hide later entries from _replay
+      try:
+        self._journal.truncate(start)
+      except OSError:
+        pass
+      raise
+
+  def _apply(self, entry: dict):
+    """Carries out a single journal entry on the article files"""
+    id = entry["id"]
+    path = self._path(id)
+    if "file" in entry:
+      os.replace(os.path.join(self.directory, entry["file"]), path)
+      # The journal only has the file's name, so the rename must be durable too
+      _fsync_dir(self.directory)
+    elif entry["article"] is None:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        self.release_id(id)
+        raise
+      self.release_id(id)
+    else:
+      with open(path, "w") as f:
+        json.dump(entry["article"], f)
+      self._unsynced.append(path)
+
+  def _undo(self, entry: dict):
+    """Journals a deletion for a write that reached the journal but failed,
+      so a replay does not bring back an article the caller was told failed
+    """
+    if "file" not in entry and entry["article"] is None:
+      return
+    try:
+      os.remove(self._path(entry["id"]))
+    except OSError:
+      pass
+    try:
+      self._submit({"id": entry["id"], "article": None}, apply=False)
+    except (OSError, RuntimeError):
+      pass
+    self.release_id(entry["id"])
+
+  def _checkpoint(self):
+    """Makes the written articles durable on their own, then empties the journal"""
+    for path in self._unsynced:
+      try:
+        fd = os.open(path, os.O_RDONLY)
+      except FileNotFoundError:
+        # Deleted since it was written
+        continue
+      try:
+        os.fsync(fd)
+      finally:
+        os.close(fd)
+    _fsync_dir(self.directory)
+    self._journal.truncate(0)
+    self._journal.seek(0)
+    os.fsync(self._journal.fileno())
+    self._unsynced.clear()
+
+  def _replay(self):
+    """Re-applies the journal so the article files match the last commit"""
+    with open(self._journal_path, "rb") as f:
+      lines = f.read().splitlines()
+
+    # Only the last entry for each ID matters (IDs are reused after deletion)
+    final = {}
+    for line in lines:
+      try:
+        entry = json.loads(line)
+      except json.JSONDecodeError:
+        # Torn write from a crash mid-batch; that batch was never acknowledged
+        break
+      final[entry["id"]] = entry
+
+    for entry in final.values():
+      try:
+        self._apply(entry)
+      except FileNotFoundError:
+        # Deletion or move already reached the disk
+        pass
+
+    # Journal entries are now all in their own files
+    self._checkpoint()
+
+    # Anything left over was never acknowledged
+    for name in os.listdir(self.directory):
+      if name.startswith(".") and name.endswith(PART_SUFFIX):
+        try:
+          os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+          pass
+
+
+def _fsync_dir(directory: str):
+  """Flushes directory entries (new file names) to disk, where supported"""
+  try:
+    fd = os.open(directory, os.O_RDONLY)
+  except OSError:
+    return
+  try:
+    os.fsync(fd)
+  except OSError:
+    pass
+  finally:
+    os.close(fd)
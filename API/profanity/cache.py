@@ -0,0 +1,93 @@
+import threading
+from collections import namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# Far longer than any wordlist entry; longer tokens are judged but not kept
+MAX_TOKEN = 64
+
+
+class VerdictCache:
+    """Bounded cache of compute(token) results, keyed by token
+
+    Eviction is CLOCK-style: a hit only marks the token as referenced, and
+    when the cache is full, tokens not referenced since the last sweep are
+    dropped (or the older half, if every token was). Hits take no lock.
+    Tokens longer than `max_token` are never stored.
+    """
+
+    def __init__(self, compute, maxsize=4096, max_token=MAX_TOKEN):
+        self.compute = compute
+        self.maxsize = maxsize
+        self.max_token = max_token
+        self.data = {}
+        self.referenced = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, token):
+        verdict = self.data.get(token)
+        if verdict is None:
+            return self.miss(token)
+        self.hits += 1
+        self.referenced.add(token)
+        return verdict
+
+    def lookup_all(self, tokens):
+        """Returns [compute(token) for token in tokens], using the cache"""
+        verdicts = list(map(self.data.get, tokens))
+        misses = 0
+        uncached = []
+        if None in verdicts:
+            for i, verdict in enumerate(verdicts):
+                if verdict is None:
+                    # May have been added earlier in this call
+                    verdict = self.data.get(tokens[i])
+                    if verdict is None:
+                        verdict = self.miss(tokens[i])
+                        misses += 1
+                        if len(tokens[i]) > self.max_token:
+                            uncached.append(tokens[i])
+                    verdicts[i] = verdict
+        self.hits += len(tokens) - misses
+        self.referenced.update(tokens)
+        self.referenced.difference_update(uncached)
+        return verdicts
+
+    def miss(self, token):
+        verdict = self.compute(token)
+        if len(token) > self.max_token:
+            with self.lock:
+                self.misses += 1
+            return verdict
+        with self.lock:
+            self.misses += 1
+            if len(self.data) >= self.maxsize:
+                self.sweep()
+            self.data[token] = verdict
+        return verdict
+
+    def sweep(self):
+        referenced = self.referenced
+        self.referenced = set()
+        kept = {token: verdict for token, verdict in self.data.items() if token in referenced}
+        if len(kept) >= self.maxsize:
+            # Everything was in use; keep the newer half
+            kept = dict(list(kept.items())[len(kept) // 2:])
+        self.data = kept
+
+    def clear(self):
+        with self.lock:
+            self.data = {}
+            self.referenced = set()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,9 +1,10 @@
 from .utils import (get_complete_path, read_wordList)
 from .trie import Trie
+from .cache import VerdictCache
 
 
 class ProfanityFilter:
-    def __init__(self):
+    def __init__(self, cache_size=4096):
         self.CHARS_MAPPING = {
             "a": ("a", "@", "*", "4"),
             "i": ("i", "*", "l", "1"),
@@ -17,6 +18,9 @@ class ProfanityFilter:
         }
         self.censor_urls = set()
         self.profane_trie = Trie()
+        # Verdicts per raw token, for censor() (case-insensitive) and isProfane()
+        self.censor_cache = VerdictCache(lambda word: self.profane_trie.hasPrefix(word.lower()), cache_size)
+        self.word_cache = VerdictCache(lambda word: self.profane_trie.hasPrefix(word), cache_size)
         self.default_wordlist_filename = get_complete_path('API/profanity/data/profanity_wordlist.txt')
         self.default_urls_filename = get_complete_path('API/profanity/data/profane_sites.txt')
 
@@ -28,6 +32,7 @@ class ProfanityFilter:
         if profane_words is None:
             profane_words = read_wordList(self.default_wordlist_filename)
         self.generate_possible_profane_words(profane_words, whitelist_words)
+        self.clear_cache()
 
     def generate_possible_profane_words(self, profane_words, whitelist_words):
         for profane_word in profane_words:
@@ -53,6 +58,13 @@ class ProfanityFilter:
                 self.dfs(profane_word, idx + 1, char_list, whitelist_words)
                 char_list.pop(len(char_list) - 1)
 
+    def clear_cache(self):
+        self.censor_cache.clear()
+        self.word_cache.clear()
+
+    def cache_info(self):
+        return {"censor": self.censor_cache.cache_info(), "word": self.word_cache.cache_info()}
+
     def load_profane_urls(self):
         profane_urls = read_wordList(self.default_urls_filename)
         for url in profane_urls:
@@ -77,26 +89,24 @@ class ProfanityFilter:
 
     def censor_profane_words(self, message, censor_char):
         message = message.split()
-        clean_message = ''
-        for word in message:
-            curr_word = ''
-            if self.profane_trie.hasPrefix(word.lower()):
-                for i in range(len(word)):
-                    curr_word += censor_char
-            else:
-                curr_word = word
-            clean_message += curr_word + ' '
-        return clean_message
+        if not message:
+            return ''
+        verdicts = self.censor_cache.lookup_all(message)
+        clean_message = [censor_char * len(word) if profane else word
+                         for word, profane in zip(message, verdicts)]
+        return ' '.join(clean_message) + ' '
 
     def isProfane(self, word):
-        if self.profane_trie.hasPrefix(word):
+        if self.word_cache(word):
             return True
         return False
 
     def add_profane_words(self, words):
         for word in words:
             self.profane_trie.insert(word)
+        self.clear_cache()
 
     def add_whitelist_words(self, words):
         for word in words:
             self.whiteList_trie.insert(word)
+        self.clear_cache()
@@ -0,0 +1,250 @@
+"""Incremental helpers for streamed article posts
+
+The request body is read in CHUNK_SIZE pieces, decoded, censored and written
+out as it arrives, so memory per upload does not depend on article length.
+"""
+
+# Imports
+import re
+import json
+import codecs
+
+from typing import Callable, Dict, Iterator, Optional, Set
+from django.http import HttpRequest
+
+CHUNK_SIZE = 64 * 1024
+# Longer than any wordlist entry, so the verdict on a word is known by then
+MAX_WORD = 1024
+# Longest title, sub-heading or JSON key accepted, in characters
+MAX_FIELD = 1024
+
+_LAST_SPACE = re.compile(r"\s(?=\S*\Z)")
+_SPACE = re.compile(r"\s")
+_STRING_SPECIAL = re.compile(r'["\\]')
+# A run of complete escape sequences, decoded in one go
+_ESCAPES = re.compile(r'(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))+')
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB]")
+_SURROGATE_PAIR = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}\\u[dD][c-fC-F][0-9a-fA-F]{2}")
+# What can follow a high surrogate if a low one is on its way
+_LOW_SURROGATE_START = re.compile(r"(\\(u([dD]([c-fC-F][0-9a-fA-F]{0,2})?)?)?)?")
+
+
+class BodyTooLarge(Exception):
+  """Raised when a request body goes over the size limit"""
+
+
+def read_chunks(request: HttpRequest, max_bytes: int) -> Iterator[str]:
+  """Yields the decoded request body, CHUNK_SIZE bytes at a time
+
+    Raises BodyTooLarge as soon as more than max_bytes have been sent,
+    and UnicodeDecodeError if the body is not UTF-8
+  """
+  try:
+    length = int(request.META.get("CONTENT_LENGTH") or 0)
+  except ValueError:
+    length = 0
+  if length > max_bytes:
+    raise BodyTooLarge()
+
+  decoder = codecs.getincrementaldecoder("utf-8")()
+  total = 0
+  while True:
+    chunk = request.read(CHUNK_SIZE)
+    if not chunk:
+      break
+    total += len(chunk)
+    if total > max_bytes:
+      raise BodyTooLarge()
+    yield decoder.decode(chunk)
+  yield decoder.decode(b"", final=True)
+
+
+class ChunkCensor:
+  """Censors text given in pieces
+
+    The concatenated output matches `profanity_filter.censor` on the whole text.
+    Words split across chunks are held back until they are complete; a word
+    longer than MAX_WORD is judged on its start and passed through as it comes.
+  """
+
+  def __init__(self, filter, censor_char: str = "*"):
+    self.filter = filter
+    self.censor_char = censor_char
+    # Unfinished word from the last chunk
+    self.carry = ""
+    # Verdict for an overlong word still being streamed (None if not in one)
+    self.long_word: Optional[bool] = None
+
+  def _long(self, text: str) -> str:
+    return self.censor_char * len(text) if self.long_word else text
+
+  def feed(self, text: str) -> str:
+    """Returns the censored text that is now complete"""
+    out = ""
+    if self.long_word is not None:
+      m = _SPACE.search(text)
+      if m is None:
+        return self._long(text)
+      out += self._long(text[:m.start()]) + " "
+      self.long_word = None
+      text = text[m.end():]
+
+    text = self.carry + text
+    m = _LAST_SPACE.search(text)
+    if m is None:
+      self.carry = text
+    else:
+      out += self.filter.censor(text[:m.end()], self.censor_char)
+      self.carry = text[m.end():]
+
+    if len(self.carry) > MAX_WORD:
+      self.long_word = self.filter.profane_trie.hasPrefix(self.carry.lower())
+      out += self._long(self.carry)
+      self.carry = ""
+    return out
+
+  def finish(self) -> str:
+    """Returns whatever is left once the text has ended"""
+    if self.long_word is not None:
+      self.long_word = None
+      return " "
+    out = self.filter.censor(self.carry, self.censor_char)
+    self.carry = ""
+    return out
+
+
+class JSONFieldStream:
+  """Incremental parser for a flat JSON object of string values
+
+    Values for keys in `streamed` are passed to `on_value(key, text)` piece by
+    piece, values for keys in `collected` are kept whole in `fields`, and
+    values for any other key are skipped without being stored.
+    Raises ValueError on anything else, including a key or collected value
+    longer than `max_field` characters.
+  """
+
+  def __init__(self, streamed: Set[str], on_value: Callable[[str, str], None],
+               collected: Set[str], max_field: int = MAX_FIELD):
+    self.streamed = streamed
+    self.on_value = on_value
+    self.collected = collected
+    self.max_field = max_field
+    self.fields: Dict[str, str] = {}
+
+    self.state = "start"
+    # Raw escape sequence split across chunks
+    self.escape = ""
+    self.key = ""
+    self.value = ""
+    self.in_key = False
+    # Streamed keys already read
+    self.seen: Set[str] = set()
+
+  def _emit(self, text: str):
+    if not text:
+      return
+    if self.in_key:
+      self.key += text
+      if len(self.key) > self.max_field:
+        raise ValueError("Key too long")
+    elif self.key in self.streamed:
+      self.on_value(self.key, text)
+    elif self.key in self.collected:
+      self.value += text
+      if len(self.value) > self.max_field:
+        raise ValueError(f"Value for {self.key!r} too long")
+
+  def _end_string(self):
+    if self.in_key:
+      self.in_key = False
+      self.state = "colon"
+      return
+    if self.key in self.fields or self.key in self.seen:
+      raise ValueError(f"Duplicate key {self.key!r}")
+    if self.key in self.streamed:
+      self.seen.add(self.key)
+    elif self.key in self.collected:
+      self.fields[self.key] = self.value
+    self.value = ""
+    self.state = "comma"
+
+  def feed(self, text: str):
+    """Parses the next piece of the document"""
+    i = 0
+    n = len(text)
+    while i < n:
+      if self.state == "string":
+        if self.escape:
+          # Finish an escape sequence started in an earlier chunk
+          text = self.escape + text[i:]
+          n = len(text)
+          i = 0
+          self.escape = ""
+        m = _STRING_SPECIAL.search(text, i)
+        if m is None:
+          self._emit(text[i:])
+          return
+        self._emit(text[i:m.start()])
+        i = m.start()
+        if text[i] == '"':
+          self._end_string()
+          i += 1
+          continue
+
+        # Decode a run of escapes at once, leaving a final high surrogate
+        # (its low half may be in the next chunk) to be handled on its own
+        m = _ESCAPES.match(text, i)
+        end = m.end() if m else i
+        if end - i >= 6 and _HIGH_SURROGATE.match(text, end - 6):
+          end -= 6
+        if end > i:
+          self._emit(json.loads('"' + text[i:end] + '"'))
+          i = end
+          continue
+
+        # Escape: \uXXXX, or a surrogate pair \uXXXX\uXXXX, else two characters
+        if not text.startswith("\\u", i):
+          size = 2
+        elif n - i < 6:
+          size = 6
+        elif _SURROGATE_PAIR.match(text, i):
+          size = 12
+        elif _HIGH_SURROGATE.match(text, i) and n - i < 12 and _LOW_SURROGATE_START.fullmatch(text, i + 6):
+          # Wait to see if the low half follows
+          size = 12
+        else:
+          size = 6
+        if i + size > n:
+          self.escape = text[i:]
+          return
+        self._emit(json.loads('"' + text[i:i + size] + '"'))
+        i += size
+        continue
+
+      c = text[i]
+      i += 1
+      if c.isspace():
+        continue
+      if self.state == "start" and c == "{":
+        self.state = "first_key"
+      elif self.state in ("key", "first_key") and c == '"':
+        self.key = ""
+        self.in_key = True
+        self.state = "string"
+      elif self.state == "first_key" and c == "}":
+        self.state = "done"
+      elif self.state == "colon" and c == ":":
+        self.state = "value"
+      elif self.state == "value" and c == '"':
+        self.state = "string"
+      elif self.state == "comma" and c == ",":
+        self.state = "key"
+      elif self.state == "comma" and c == "}":
+        self.state = "done"
+      else:
+        raise ValueError(f"Unexpected {c!r}")
+
+  def finish(self):
+    """Checks the document was complete"""
+    if self.state != "done":
+      raise ValueError("Incomplete JSON object")
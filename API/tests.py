@@ -1,9 +1,18 @@
+import os
 import re
 import json
 import time
+import atexit
+import shutil
+import tempfile
 
-from django.test import RequestFactory
-from .views import get_article, post_article, MAX_FAIL, MIN_SEP
+from django.test import RequestFactory, override_settings
+from .views import get_article, post_article, MAX_FAIL, MAX_WARN, MIN_SEP
+
+# Articles are stored on disk; use a scratch directory, not the real one
+ARTICLES_DIR = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, ARTICLES_DIR, ignore_errors=True)
+override_settings(ARTICLES_DIR=ARTICLES_DIR).enable()
 
 # Setup testing
 DATA = {
@@ -18,7 +27,8 @@ factory = RequestFactory()
 req = factory.post("/API/article", DATA)
 resp = post_article(req, bypass_limits=True)
 
-assert resp.status_code == 200
+# Redirects to the new article
+assert resp.status_code == 302
 
 # Test getting an article (0 will always exist)
 req2 = factory.get("/API/article/")
@@ -32,8 +42,8 @@ assert all(
 # Bad data
 req = factory.post("/API/article", {"BAD": "DATA"})
 
-# Test rate limiting
-for _ in range(5):
+# Test rate limiting (the request after MAX_WARN rapid ones is limited)
+for _ in range(MAX_WARN):
     post_article(req)
 else:
     resp = post_article(req)
@@ -45,3 +55,192 @@ for _ in range(MAX_FAIL + 1):
     resp = post_article(req)
 else:
     assert resp.status_code == 400
+
+# Test group-commit writer
+import threading
+from .group_commit import GroupCommitWriter, JOURNAL_NAME
+
+
+def write_article(writer):
+    id = writer.allocate_id()
+    writer.write(id, {"id": id, **DATA})
+
+
+# Concurrent writes share one journal write
+directory = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, directory, ignore_errors=True)
+writer = GroupCommitWriter(directory, max_batch=4, max_delay=5)
+threads = [threading.Thread(target=write_article, args=(writer,)) for _ in range(4)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+assert writer.batches == 1
+assert sorted(os.listdir(directory)) == [JOURNAL_NAME, "0", "1", "2", "3"]
+
+# Only one writer per directory
+try:
+    GroupCommitWriter(directory)
+except RuntimeError:
+    pass
+else:
+    assert False, "Second writer allowed"
+
+# Replay restores lost files, keeps deletions and skips a torn final line
+writer.delete(3)
+writer.close()
+os.remove(os.path.join(directory, "0"))  # Simulate the file write being lost
+with open(os.path.join(directory, JOURNAL_NAME), "ab") as f:
+    f.write(b'{"id": 9, "arti')  # Simulate a crash mid-batch
+
+writer = GroupCommitWriter(directory)
+assert sorted(os.listdir(directory)) == [JOURNAL_NAME, "0", "1", "2"]
+with open(os.path.join(directory, "0")) as f:
+    assert json.load(f)["title"] == DATA["title"]
+
+# Deleted IDs are reused
+assert writer.allocate_id() == 3
+writer.release_id(3)
+
+# A journaled write that then fails is not brought back by replay
+os.mkdir(os.path.join(directory, "7"))
+try:
+    writer.write(7, {"id": 7, **DATA})
+except OSError:
+    pass
+else:
+    assert False, "Write into a directory succeeded"
+writer.close()
+os.rmdir(os.path.join(directory, "7"))
+
+writer = GroupCommitWriter(directory)
+assert "7" not in os.listdir(directory)
+
+# A write that never reaches the journal gives its ID back
+def fail_append(entries):
+    raise OSError("Simulated journal failure")
+
+
+writer._append = fail_append
+id = writer.allocate_id()
+try:
+    writer.write(id, {"id": id, **DATA})
+except OSError:
+    pass
+else:
+    assert False, "Write succeeded without the journal"
+assert writer.allocate_id() == id
+writer.close()
+
+# Test chunked censoring matches censoring the whole text
+from .views import FILTER, post_article_stream
+from .streaming import ChunkCensor
+
+text = "This is a fuck ing test\n  article shit" + " x" * 100
+for size in (1, 3, 7, 64):
+    censor = ChunkCensor(FILTER)
+    out = "".join(censor.feed(text[i:i + size]) for i in range(0, len(text), size))
+    assert out + censor.finish() == FILTER.censor(text)
+
+# Test streaming a JSON article
+req = factory.post("/API/article/stream", json.dumps(DATA), content_type="application/json")
+resp = post_article_stream(req, bypass_limits=True)
+assert resp.status_code == 302
+
+id = int(re.search(r"article/(\d+)", resp["Location"]).group(1))
+resp_data = json.loads(get_article(factory.get("/API/article/"), id, bypass_limits=True).content)
+assert resp_data["content"] == FILTER.censor(DATA["content"])
+
+# Test streaming a raw-text article, with the title in the query
+req = factory.post("/API/article/stream?title=Raw&sub_heading=Text", "Raw content.", content_type="text/plain")
+resp = post_article_stream(req, bypass_limits=True)
+assert resp.status_code == 302
+
+id = int(re.search(r"article/(\d+)", resp["Location"]).group(1))
+resp_data = json.loads(get_article(factory.get("/API/article/"), id, bypass_limits=True).content)
+assert (resp_data["title"], resp_data["content"]) == ("Raw ", "Raw content. ")
+
+# Test failed streams leave no files behind
+articles = ARTICLES_DIR
+before = sorted(os.listdir(articles))
+
+with override_settings(ARTICLE_STREAM_MAX_BYTES=10):
+    req = factory.post("/API/article/stream?title=a&sub_heading=b", "x" * 11, content_type="text/plain")
+    assert post_article_stream(req, bypass_limits=True).status_code == 413
+
+req = factory.post("/API/article/stream?title=a&sub_heading=b", b"\xff\xfe", content_type="text/plain")
+assert post_article_stream(req, bypass_limits=True).status_code == 400
+
+req = factory.post("/API/article/stream", '{"title": "a", "content": 1}', content_type="application/json")
+assert post_article_stream(req, bypass_limits=True).status_code == 400
+
+from .streaming import MAX_FIELD
+
+long_title = {**DATA, "title": "t" * (MAX_FIELD + 1)}
+req = factory.post("/API/article/stream", json.dumps(long_title), content_type="application/json")
+assert post_article_stream(req, bypass_limits=True).status_code == 400
+
+req = factory.post(f"/API/article/stream?title={'t' * (MAX_FIELD + 1)}&sub_heading=b", "x", content_type="text/plain")
+assert post_article_stream(req, bypass_limits=True).status_code == 400
+
+assert sorted(os.listdir(articles)) == before
+
+# Unknown keys are skipped, and streamed files get the same mode as posted ones
+req = factory.post("/API/article/stream", json.dumps({**DATA, "extra": "x" * 10000}), content_type="application/json")
+resp = post_article_stream(req, bypass_limits=True)
+assert resp.status_code == 302
+
+id = int(re.search(r"article/(\d+)", resp["Location"]).group(1))
+assert os.stat(os.path.join(articles, str(id))).st_mode == os.stat(os.path.join(articles, "0")).st_mode
+
+# Test a streamed article reusing a deleted ID survives group-commit replay
+from . import views
+
+views.WRITER = GroupCommitWriter(articles)
+id = views.WRITER.allocate_id()
+views.WRITER.write(id, {"id": id, **DATA})
+views.WRITER.delete(id)
+
+req = factory.post("/API/article/stream", json.dumps(DATA), content_type="application/json")
+resp = post_article_stream(req, bypass_limits=True)
+assert resp["Location"].startswith(f"/API/article/{id}?")
+views.WRITER.close()
+
+# An unexpected error still removes the upload file
+req = factory.post("/API/article/stream", json.dumps(DATA), content_type="application/json")
+try:
+    post_article_stream(req, bypass_limits=True)
+except RuntimeError:
+    pass
+else:
+    assert False, "Stream saved through a closed writer"
+assert not [name for name in os.listdir(articles) if name.endswith(".part")]
+
+# Replay keeps the streamed article and removes stale upload files
+with open(os.path.join(articles, ".stale.part"), "w") as f:
+    f.write("{")
+views.WRITER = GroupCommitWriter(articles)
+views.WRITER.close()
+views.WRITER = None
+assert os.path.exists(os.path.join(articles, str(id)))
+assert not os.path.exists(os.path.join(articles, ".stale.part"))
+
+# Test censor verdict cache is used and cleared on wordlist changes
+from .profanity.profanity_filter import ProfanityFilter
+
+profanity_filter = ProfanityFilter()
+profanity_filter.censor("repeat repeat repeat")
+assert profanity_filter.cache_info()["censor"].hits == 2
+
+profanity_filter.add_profane_words(["repeat"])
+assert profanity_filter.cache_info()["censor"].currsize == 0
+assert profanity_filter.censor("repeat") == "****** "
+
+# Overlong tokens are judged but not kept in the cache
+currsize = profanity_filter.cache_info()["censor"].currsize
+long_token = "q" * 1024 * 1024
+assert profanity_filter.censor(long_token + " " + long_token) == long_token + " " + long_token + " "
+assert not profanity_filter.isProfane(long_token)
+assert profanity_filter.cache_info()["censor"].currsize == currsize
+assert profanity_filter.cache_info()["word"].currsize == 0
+assert long_token not in profanity_filter.censor_cache.referenced
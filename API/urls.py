@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('article/<int:id>', views.get_article, name="article"),
     path('article', views.post_article, name="post_article"),
+    path('article/stream', views.post_article_stream, name="post_article_stream"),
     path("delete_article/<int:id>", views.delete_article),
     path("", views.redirect_docs),  # Redirect empty to the documentation
     path("test", views.test)
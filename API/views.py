@@ -4,9 +4,11 @@
 import os
 import json
 import time
+import atexit
 import random
+import secrets
 
-from server.settings import BASE_DIR
+from django.conf import settings
 from django.shortcuts import redirect
 from django.http import (HttpResponse, HttpResponseBadRequest,
   HttpResponseServerError, HttpRequest, HttpResponseRedirect)
@@ -18,6 +20,33 @@ from collections import defaultdict
 from .profanity import profanity_filter
 FILTER = profanity_filter.ProfanityFilter()
 
+# Streamed posts
+from .streaming import BodyTooLarge, ChunkCensor, JSONFieldStream, MAX_FIELD, read_chunks
+
+# Background article writer (None writes synchronously on the request thread)
+WRITER = None
+
+
+def start_writer():
+  """Starts the background article writer if ARTICLE_GROUP_COMMIT is on
+
+    The WSGI/ASGI entry points call this as the worker starts, so a worker
+    that cannot lock the articles directory fails then, not on a request
+  """
+  global WRITER
+  if not settings.ARTICLE_GROUP_COMMIT or WRITER is not None:
+    return
+  # Only imported when needed, as it relies on fcntl (not on Windows)
+  from .group_commit import GroupCommitWriter
+  WRITER = GroupCommitWriter(
+    settings.ARTICLES_DIR,
+    settings.ARTICLE_COMMIT_MAX_BATCH, settings.ARTICLE_COMMIT_MAX_DELAY
+  )
+  atexit.register(WRITER.close)
+
+
+start_writer()
+
 
 @dataclass
 class User:
@@ -122,7 +151,7 @@ def get_article(request: HttpRequest, id: int, bypass_limits=False):
     return HttpResponseBadRequest("This endpoint only accepts GET requests.")
 
   # Try to access and load the file
-  path = os.path.join(BASE_DIR, f"articles/{id}")
+  path = os.path.join(settings.ARTICLES_DIR, str(id))
   try:
     with open(path) as f:
       article = json.loads(f.read())
@@ -186,9 +215,12 @@ def post_article(request: HttpRequest, bypass_limits=False):
     return HttpResponseBadRequest("This endpoint only accepts POST requests. See docs.")
 
   # Find next available file
-  path = os.path.join(BASE_DIR, "articles/")
-  id = 0
-  while os.path.exists(f"{path}{id}"): id += 1
+  path = os.path.join(settings.ARTICLES_DIR, "")
+  if WRITER is not None:
+    id = WRITER.allocate_id()
+  else:
+    id = 0
+    while os.path.exists(f"{path}{id}"): id += 1
 
   # Get data from request
   post_data = request.POST
@@ -201,6 +233,8 @@ def post_article(request: HttpRequest, bypass_limits=False):
       "date_published": time.strftime("%d/%m/%Y")
     }
   except KeyError:
+    if WRITER is not None:
+      WRITER.release_id(id)
     fail(ip)
     return HttpResponseBadRequest("Bad data format. See docs.")
 
@@ -212,12 +246,160 @@ def post_article(request: HttpRequest, bypass_limits=False):
   article["key"] = hash(key)
 
   # Data was okay
-  with open(f"{path}{id}", "w") as f:
-    json.dump(article, f)
+  if WRITER is not None:
+    try:
+      WRITER.write(id, article)
+    except OSError:
+      return HttpResponseServerError("Could not save article, please let us know.")
+  else:
+    with open(f"{path}{id}", "w") as f:
+      json.dump(article, f)
 
   return HttpResponseRedirect(f"/API/article/{id}?key={key}")
 
 
+def post_article_stream(request: HttpRequest, bypass_limits=False):
+  """Endpoint to add an article, reading the body as it arrives
+
+    Accepts either:
+      - Content-Type application/json, with a body in form:
+          {
+            "title": <title>,
+            "sub_heading": <sub_heading>,
+            "content": <content>
+          }
+      - any other Content-Type, with the raw body as the content and
+        `title` and `sub_heading` as query parameters
+
+    Content is censored and written to the article file chunk by chunk, so
+    memory use does not grow with the article. Bodies over
+    ARTICLE_STREAM_MAX_BYTES are rejected with 413, and titles or
+    sub-headings over MAX_FIELD characters with 400.
+
+    On success, redirects to the new article with the deletion key as a parameter
+  """
+
+  ip = get_client_ip(request)
+  prev = USERS[ip].last_req
+  USERS[ip].last_req = time.time()
+
+  # Check allowed
+  if not bypass_limits:
+    match allowed(USERS[ip], prev):
+      case 1:
+        return HttpResponseBadRequest(
+          f"Too many failed requests, try again in {FAIL_TIMEOUT}s."
+        )
+      case 2:
+        resp = HttpResponse(f"You have been rate limited; limit requests to {MIN_SEP}/s")
+        resp.status_code = 429
+        return resp
+
+  # Only accepts POST
+  if request.method != 'POST':
+    fail(ip)
+    return HttpResponseBadRequest("This endpoint only accepts POST requests. See docs.")
+
+  is_json = request.content_type == "application/json"
+  if not is_json and not all(k in request.GET and len(request.GET[k]) <= MAX_FIELD
+                             for k in ("title", "sub_heading")):
+    fail(ip)
+    return HttpResponseBadRequest("Bad data format. See docs.")
+
+  # Stream into a hidden file; it gets an article ID once it is complete.
+  # Created like post_article's files, so the umask applies to it the same way
+  part = os.path.join(settings.ARTICLES_DIR, f".{secrets.token_hex(8)}.part")
+  fd = os.open(part, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+  censor = ChunkCensor(FILTER)
+  try:
+    # Content goes first in the file, as in JSON bodies it may come before the title
+    with open(fd, "w") as f:
+      f.write('{"content": "')
+
+      def write_content(_, text):
+        f.write(json.dumps(censor.feed(text))[1:-1])
+
+      if is_json:
+        parser = JSONFieldStream({"content"}, write_content, {"title", "sub_heading"})
+        for chunk in read_chunks(request, settings.ARTICLE_STREAM_MAX_BYTES):
+          parser.feed(chunk)
+        parser.finish()
+        if "content" not in parser.seen:
+          raise KeyError("content")
+        fields = parser.fields
+      else:
+        for chunk in read_chunks(request, settings.ARTICLE_STREAM_MAX_BYTES):
+          write_content("content", chunk)
+        fields = request.GET
+      f.write(json.dumps(censor.finish())[1:-1] + '"')
+
+      key = "".join([chr(ord("a") + random.randint(0, 25)) for _ in range(10)])
+      id = save_streamed_article(f, part, {
+        "title": FILTER.censor(fields["title"]),
+        "sub_heading": FILTER.censor(fields["sub_heading"]),
+        "date_published": time.strftime("%d/%m/%Y"),
+        "key": hash(key)
+      })
+
+  except BodyTooLarge:
+    resp = HttpResponse(f"Request body too large; limit is {settings.ARTICLE_STREAM_MAX_BYTES} bytes.")
+    resp.status_code = 413
+  except (ValueError, KeyError):
+    # Includes bad JSON and bodies that are not UTF-8
+    fail(ip)
+    resp = HttpResponseBadRequest("Bad data format. See docs.")
+  except OSError:
+    resp = HttpResponseServerError("Could not save article, please let us know.")
+  else:
+    resp = HttpResponseRedirect(f"/API/article/{id}?key={key}")
+  finally:
+    # The article (if saved) has its own name by now
+    try:
+      os.remove(part)
+    except FileNotFoundError:
+      pass
+
+  return resp
+
+
+def save_streamed_article(f, part: str, fields: dict) -> int:
+  """Finishes a streamed article and gives it the next free ID
+
+    f is the open file at `part`, holding everything up to the content;
+    `fields` are the rest, which get written along with the ID.
+    Returns the ID. The file is left at `part` as well unless WRITER moved it.
+  """
+  tail = f.tell()
+
+  # Group commit promises durability, so the file goes through the journal
+  if WRITER is not None:
+    id = WRITER.allocate_id()
+    try:
+      f.write(", " + json.dumps({"id": id, **fields})[1:])
+      f.flush()
+      os.fsync(f.fileno())
+    except OSError:
+      WRITER.release_id(id)
+      raise
+    WRITER.write_file(id, part)
+    return id
+
+  # Linking claims the ID atomically; if another post took it, rewrite the ID and retry
+  path = os.path.join(settings.ARTICLES_DIR, "")
+  id = 0
+  while True:
+    while os.path.exists(f"{path}{id}"): id += 1
+    f.seek(tail)
+    f.truncate()
+    f.write(", " + json.dumps({"id": id, **fields})[1:])
+    f.flush()
+    try:
+      os.link(part, f"{path}{id}")
+      return id
+    except FileExistsError:
+      id += 1
+
+
 def delete_article(request: HttpRequest, id: int, bypass_limits=False):
   """Endpoint to delete an article, given the key:
 
@@ -249,7 +431,7 @@ def delete_article(request: HttpRequest, id: int, bypass_limits=False):
     return HttpResponseBadRequest("This endpoint only accepts POST requests. See docs.")
 
   # Get key from article and request
-  path = os.path.join(BASE_DIR, f"articles/{id}")
+  path = os.path.join(settings.ARTICLES_DIR, str(id))
   try:
     with open(path) as f:
       article = json.loads(f.read())
@@ -267,7 +449,15 @@ def delete_article(request: HttpRequest, id: int, bypass_limits=False):
 
   # Check key
   if hash(key) == article["key"]:
-    os.remove(path)
+    if WRITER is not None:
+      try:
+        WRITER.delete(id)
+      except FileNotFoundError:
+        return HttpResponseBadRequest("File not found.")
+      except OSError:
+        return HttpResponseServerError("Could not delete article, please let us know.")
+    else:
+      os.remove(path)
     return HttpResponse(f"Article {id} deleted.")
   else:
     fail(ip)
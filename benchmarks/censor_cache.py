@@ -0,0 +1,97 @@
+"""Censoring speed with and without the ProfanityFilter verdict cache
+
+Run from the repository root:
+  python -m benchmarks.censor_cache [PATH ...]
+
+PATHs are text files or directories of them (stored articles are JSON, and
+their content is used). The default is the articles/ directory plus the
+repository's own prose: LICENSE, README.md and the docs pages.
+"""
+
+# Imports
+import os
+import re
+import sys
+import json
+import time
+
+from API.profanity.profanity_filter import ProfanityFilter
+
+DEFAULT_PATHS = ["articles", "LICENSE", "README.md", "docs"]
+REPEATS = 20
+
+
+def read_text(path: str) -> str:
+  """Returns the prose in a file: article content, HTML without tags, or plain text"""
+  with open(path, encoding="utf-8", errors="replace") as f:
+    text = f.read()
+  try:
+    return json.loads(text)["content"]
+  except (ValueError, KeyError, TypeError):
+    pass
+  if path.endswith(".html"):
+    return re.sub(r"<[^>]+>", " ", text)
+  return text
+
+
+def load_corpus(paths) -> str:
+  texts = []
+  for path in paths:
+    if os.path.isdir(path):
+      for name in sorted(os.listdir(path)):
+        file = os.path.join(path, name)
+        # Skip in-progress uploads, the journal and code
+        if os.path.isfile(file) and not name.startswith(".") and not name.endswith(".py"):
+          texts.append(read_text(file))
+    elif os.path.exists(path):
+      texts.append(read_text(path))
+  return "\n".join(texts)
+
+
+def censor_uncached(profanity_filter: ProfanityFilter, message: str, censor_char="*") -> str:
+  """censor_profane_words as it was before the verdict cache"""
+  message = message.split()
+  clean_message = ''
+  for word in message:
+    curr_word = ''
+    if profanity_filter.profane_trie.hasPrefix(word.lower()):
+      for i in range(len(word)):
+        curr_word += censor_char
+    else:
+      curr_word = word
+    clean_message += curr_word + ' '
+  return clean_message
+
+
+def timed(fn) -> float:
+  """Returns the best time of REPEATS calls, in milliseconds"""
+  best = float("inf")
+  for _ in range(REPEATS):
+    start = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - start)
+  return best * 1000
+
+
+def main():
+  corpus = load_corpus(sys.argv[1:] or DEFAULT_PATHS)
+  tokens = corpus.split()
+  print(f"{len(tokens)} tokens, {len(set(tokens))} distinct")
+
+  profanity_filter = ProfanityFilter()
+  assert censor_uncached(profanity_filter, corpus) == profanity_filter.censor(corpus)
+
+  uncached = timed(lambda: censor_uncached(profanity_filter, corpus))
+  profanity_filter.clear_cache()
+  cold = timed(lambda: (profanity_filter.clear_cache(), profanity_filter.censor(corpus)))
+  profanity_filter.clear_cache()
+  warm = timed(lambda: profanity_filter.censor(corpus))
+
+  print(f"{'uncached':>12}: {uncached:8.2f}ms")
+  print(f"{'cold cache':>12}: {cold:8.2f}ms")
+  print(f"{'warm cache':>12}: {warm:8.2f}ms  ({uncached / warm:.1f}x)")
+  print(f"{'hit rate':>12}: {profanity_filter.censor_cache.hit_rate:.1%}")
+
+
+if __name__ == "__main__":
+  main()
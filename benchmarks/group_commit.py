@@ -0,0 +1,112 @@
+"""Throughput of durable article writes, with and without group commit
+
+Run from the repository root:
+  python -m benchmarks.group_commit [--posts N] [--threads N] [--delay S] [--dir DIR]
+                                    [--journal-only]
+
+Each mode writes the same articles from the same number of threads into a
+fresh directory (on the filesystem of --dir, default the system temp dir):
+  fsync per post: each thread writes and fsyncs its own file
+  group commit:   GroupCommitWriter at several max_batch sizes
+
+Creating the article files is usually the slower part on fast-fsync storage;
+--journal-only skips it to time the journal commits alone.
+"""
+
+# Imports
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+from API.group_commit import GroupCommitWriter
+
+ARTICLE = {"title": "Benchmark", "sub_heading": "", "content": "lorem ipsum " * 200}
+
+
+def run_threads(threads: int, posts: int, post) -> float:
+  """Runs post() posts times, spread over threads; returns elapsed seconds"""
+  per_thread = posts // threads
+
+  def work():
+    for _ in range(per_thread):
+      post()
+
+  workers = [threading.Thread(target=work) for _ in range(threads)]
+  start = time.perf_counter()
+  for w in workers:
+    w.start()
+  for w in workers:
+    w.join()
+  return time.perf_counter() - start
+
+
+def fsync_per_post(directory: str, threads: int, posts: int) -> float:
+  lock = threading.Lock()
+  next_id = [0]
+
+  def post():
+    with lock:
+      id = next_id[0]
+      next_id[0] += 1
+    with open(os.path.join(directory, str(id)), "w") as f:
+      json.dump({"id": id, **ARTICLE}, f)
+      f.flush()
+      os.fsync(f.fileno())
+
+  return run_threads(threads, posts, post)
+
+
+def group_commit(directory: str, threads: int, posts: int, max_batch: int, max_delay: float,
+                 journal_only: bool):
+  writer = GroupCommitWriter(directory, max_batch=max_batch, max_delay=max_delay)
+
+  def post():
+    id = writer.allocate_id()
+    if journal_only:
+      writer._submit({"id": id, "article": {"id": id, **ARTICLE}}, apply=False)
+    else:
+      writer.write(id, {"id": id, **ARTICLE})
+
+  elapsed = run_threads(threads, posts, post)
+  batches = writer.batches
+  writer.close()
+  return elapsed, batches
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--posts", type=int, default=4000)
+  parser.add_argument("--threads", type=int, default=64)
+  parser.add_argument("--delay", type=float, default=.001, help="max_delay in seconds")
+  parser.add_argument("--dir", default=None)
+  parser.add_argument("--journal-only", action="store_true")
+  args = parser.parse_args()
+  posts = args.posts // args.threads * args.threads
+
+  print(f"{posts} posts from {args.threads} threads")
+  if not args.journal_only:
+    directory = tempfile.mkdtemp(dir=args.dir)
+    try:
+      elapsed = fsync_per_post(directory, args.threads, posts)
+      print(f"{'fsync per post':>24}: {posts / elapsed:8.0f} posts/s")
+    finally:
+      shutil.rmtree(directory)
+
+  for max_batch in (1, 8, 64):
+    directory = tempfile.mkdtemp(dir=args.dir)
+    try:
+      elapsed, batches = group_commit(
+        directory, args.threads, posts, max_batch, args.delay, args.journal_only
+      )
+    finally:
+      shutil.rmtree(directory)
+    print(f"{f'group commit, batch {max_batch}':>24}: {posts / elapsed:8.0f} posts/s"
+          f"  ({posts / batches:.1f} posts per fsync)")
+
+
+if __name__ == "__main__":
+  main()
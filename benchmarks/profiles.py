@@ -0,0 +1,92 @@
+"""Worker cold start and per-request overhead, full vs API-only profile
+
+Run from the repository root:
+  python -m benchmarks.profiles [--runs N] [--requests N]
+
+Each run starts a fresh Python process that imports the WSGI entry point
+and calls the WSGI application directly (no server or network):
+  boot:           importing server.wsgi / server.wsgi_api (django.setup(),
+                  apps, middleware)
+  first requests: the first GET /API/test and GET /docs/, which load the
+                  URLconf, the views (and the profanity wordlist) and templates
+  per request:    mean time of GET /API/test on the warmed-up application
+Medians over the runs are printed, with the number of modules loaded.
+"""
+
+# Imports
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+
+PROFILES = ["server.wsgi", "server.wsgi_api"]
+
+
+def environ(path: str) -> dict:
+  return {
+    "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+    "SERVER_NAME": "bench", "SERVER_PORT": "80", "REMOTE_ADDR": "127.0.0.1",
+    "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http",
+  }
+
+
+def measure(module: str, requests: int) -> dict:
+  """Times one worker; runs in its own process"""
+  start = time.perf_counter()
+  application = importlib.import_module(module).application
+  booted = time.perf_counter()
+
+  statuses = []
+  for path in ("/API/test", "/docs/"):
+    b"".join(application(environ(path), lambda status, headers: statuses.append(status)))
+  warmed = time.perf_counter()
+  assert all(status.startswith("200") for status in statuses), statuses
+
+  for _ in range(requests):
+    b"".join(application(environ("/API/test"), lambda status, headers: None))
+  done = time.perf_counter()
+
+  return {
+    "boot": booted - start,
+    "first": warmed - booted,
+    "request": (done - warmed) / requests,
+    "modules": len(sys.modules),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--requests", type=int, default=5000)
+  parser.add_argument("--worker", help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.worker:
+    print(json.dumps(measure(args.worker, args.requests)))
+    return
+
+  # Let each entry point pick its own settings
+  env = {k: v for k, v in os.environ.items() if k != "DJANGO_SETTINGS_MODULE"}
+  print(f"{'profile':<16} {'boot':>8} {'first requests':>15} {'per request':>12} {'modules':>8}")
+  for module in PROFILES:
+    runs = [
+      json.loads(subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.profiles", "--worker", module,
+         "--requests", str(args.requests)], env=env
+      ))
+      for _ in range(args.runs)
+    ]
+
+    def median(key):
+      return sorted(run[key] for run in runs)[len(runs) // 2]
+
+    print(f"{module:<16} {median('boot') * 1000:6.1f}ms {median('first') * 1000:13.1f}ms"
+          f" {median('request') * 1e6:10.1f}us {median('modules'):8}")
+
+
+if __name__ == "__main__":
+  main()
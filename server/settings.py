@@ -116,6 +116,27 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Article storage
+
+ARTICLES_DIR = BASE_DIR / 'articles'
+
+# With ARTICLE_GROUP_COMMIT on, posts and deletions are handed to a background
+# writer that commits up to ARTICLE_COMMIT_MAX_BATCH of them with a single
+# fsync, waiting at most ARTICLE_COMMIT_MAX_DELAY seconds for a batch to fill.
+# Only one process may write articles this way: run a single worker process
+# (use threads for concurrency). The WSGI/ASGI entry points start the writer
+# as the worker boots, so a second worker fails to start.
+
+ARTICLE_GROUP_COMMIT = False
+
+ARTICLE_COMMIT_MAX_BATCH = 64
+
+ARTICLE_COMMIT_MAX_DELAY = .001
+
+# Largest request body accepted by the streaming article endpoint, in bytes
+
+ARTICLE_STREAM_MAX_BYTES = 32 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,42 @@
+"""
+API-only settings for server project.
+
+Same as `server.settings`, minus the admin, auth, sessions, messages and
+staticfiles apps and their middleware and context processors, none of which
+the `API` or `docs` URLconfs use. Serve with `server.wsgi_api` or
+`server.asgi_api`.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+# Application definition
+
+INSTALLED_APPS = []
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': ["docs"],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'context_processors': [],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'server.wsgi_api.application'
+
+AUTH_PASSWORD_VALIDATORS = []
+
+
+# Internationalization
+# No translated strings are served, so skip loading the translation machinery
+
+USE_I18N = False
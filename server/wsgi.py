@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 application = get_wsgi_application()
+
+# Group commit allows a single writer process; take the articles directory now
+# so a second worker fails to start instead of failing its requests
+from django.conf import settings
+
+if settings.ARTICLE_GROUP_COMMIT:
+    from API.views import start_writer
+    start_writer()
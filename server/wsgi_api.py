@@ -0,0 +1,21 @@
+"""
+WSGI config for server project, API-only profile.
+
+Like ``server.wsgi``, but uses ``server.settings_api``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings_api')
+
+application = get_wsgi_application()
+
+# Group commit allows a single writer process; take the articles directory now
+# so a second worker fails to start instead of failing its requests
+from django.conf import settings
+
+if settings.ARTICLE_GROUP_COMMIT:
+    from API.views import start_writer
+    start_writer()